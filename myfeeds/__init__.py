@@ -10,4 +10,6 @@ if not config.debug and config.sentry_dsn:
     sentry_sdk.init(config.sentry_dsn)
 
 # jinja2 Environment
-env = Environment(loader=PackageLoader("myfeeds", "templates"),)
+env = Environment(
+    loader=PackageLoader("myfeeds", "templates"), auto_reload=False, cache_size=-1,
+)
@@ -5,6 +5,11 @@ from typing import Any, Dict, Tuple
 
 import yaml
 
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
@@ -39,6 +44,8 @@ class ConfigFileError(ConfigError):
 
 
 class UpperDict:
+    __slots__ = ("_UpperDict__dict",)
+
     def __init__(self, data: dict):
         self.__dict: typing.Dict[str, typing.Any] = dict()
 
@@ -46,27 +53,22 @@ class UpperDict:
             self[key] = data[key]
 
     def __str__(self) -> str:
-        indent = 4
-        result = ["{"]
-
-        def append(line):
-            result.append(" " * indent + line)
+        lines = ["{"]
+        self._write(lines, 4)
+        lines.append("}")
+        return "\n".join(lines)
 
+    def _write(self, lines: typing.List[str], indent: int) -> None:
+        padding = " " * indent
         for key, value in self.__dict.items():
             if isinstance(value, UpperDict):
-                append(f"{key}: {{")
-                for line in str(value).splitlines()[1:-1]:
-                    append(f"{line}")
-                append("}")
+                lines.append(f"{padding}{key}: {{")
+                value._write(lines, indent + 4)
+                lines.append(f"{padding}}}")
+            elif isinstance(value, str):
+                lines.append(f"{padding}{key}: '{value}',")
             else:
-                if isinstance(value, str):
-                    append(f"{key}: '{value}',")
-                else:
-                    append(f"{key}: {value},")
-
-        result.append("}")
-
-        return "\n".join(result)
+                lines.append(f"{padding}{key}: {value},")
 
     def __setitem__(self, key: str, value: typing.Any) -> None:
         key = key.upper()
@@ -85,20 +87,14 @@ class UpperDict:
 
     def __getattr__(self, name: str) -> typing.Any:
         try:
-            value = self.get(name, ...)
-            if value is ...:
-                raise KeyError()
-            return value
+            return self.__dict[name.upper()]
         except KeyError:
             raise AttributeError(
                 f"'{self.__class__.__name__}' object has no attribute '{name}'"
-            )
+            ) from None
 
     def get(self, key: str, default=None) -> typing.Any:
-        try:
-            return self[key]
-        except KeyError:
-            return default
+        return self.__dict.get(key.upper(), default)
 
     def keys(self):
         return self.__dict.keys()
@@ -117,6 +113,8 @@ def _import_environ() -> typing.Dict:
 
 
 class Config(UpperDict, metaclass=Singleton):
+    __slots__ = ()
+
     def __init__(self) -> None:
         super().__init__({})
         self.setdefault()
@@ -132,7 +130,7 @@ class Config(UpperDict, metaclass=Singleton):
 
     def import_from_file(self) -> None:
         with open(os.path.join(BASE_DIR, "config.yml"), "rb") as file:
-            data = yaml.safe_load(file)
+            data = yaml.load(file, Loader=SafeLoader)
 
         if not isinstance(data, dict):
             raise ConfigError(f"config must be a dictionary.")
@@ -164,12 +162,23 @@ class Config(UpperDict, metaclass=Singleton):
             value = bool(value)
         super().__setitem__(key, value)
 
-    def get(self, key, default=None) -> typing.Any:
-        env = super().get(self["env"], {})
-        value = env.get(key, ...)
+    def __getattr__(self, name: str) -> typing.Any:
+        value = self.get(name, ...)
         if value is ...:
-            value = super().get(key, default)
+            raise AttributeError(
+                f"'{self.__class__.__name__}' object has no attribute '{name}'"
+            )
         return value
 
+    def get(self, key, default=None) -> typing.Any:
+        key = key.upper()
+        data = self._UpperDict__dict
+        env = data.get(data["ENV"].upper())
+        if env is not None:
+            value = env.get(key, ...)
+            if value is not ...:
+                return value
+        return data.get(key, default)
+
 
 config = Config()
@@ -1,5 +1,12 @@
 import logging
 import logging.config
+import queue
+from logging.handlers import (
+    MemoryHandler,
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+)
 from pathlib import Path
 
 from myfeeds.config import BASE_DIR, LOG_LEVELS, config
@@ -30,12 +37,14 @@ DEFAULT_LOGGING = {
         "file": {
             "level": logging.DEBUG,
             "filters": ["require_debug_false"],
-            "class": "logging.handlers.RotatingFileHandler",
+            "()": "myfeeds.log.QueueRotatingFileHandler",
             "formatter": "default",
             "filename": str(Path(BASE_DIR).joinpath(".logs", "myfeeds.log")),
             "maxBytes": 5 * 1024 * 1024,
             "backupCount": 60,
             "encoding": "utf-8",
+            "capacity": 512,
+            "flush_interval": 60,
         },
     },
     "loggers": {"feeder": {"handlers": ["console", "file"], "level": logging.DEBUG}},
@@ -48,10 +57,68 @@ def config_logging():
 
 
 class RequireDebugFalse(logging.Filter):
+    def __init__(self, name=""):
+        super().__init__(name)
+        self._debug = config.debug
+
     def filter(self, record):
-        return not config.debug
+        return not self._debug
 
 
 class RequireDebugTrue(logging.Filter):
+    def __init__(self, name=""):
+        super().__init__(name)
+        self._debug = config.debug
+
     def filter(self, record):
-        return config.debug
+        return self._debug
+
+
+class TimedMemoryHandler(MemoryHandler):
+    """also flush once the oldest buffered record is flush_interval seconds old"""
+
+    def __init__(
+        self, capacity, flushLevel=logging.ERROR, target=None, flush_interval=60
+    ):
+        super().__init__(capacity, flushLevel=flushLevel, target=target)
+        self.flush_interval = flush_interval
+
+    def shouldFlush(self, record):
+        return (
+            super().shouldFlush(record)
+            or record.created - self.buffer[0].created >= self.flush_interval
+        )
+
+
+class QueueRotatingFileHandler(QueueHandler):
+    """write records to a rotating file in batches from a background thread"""
+
+    def __init__(
+        self,
+        filename,
+        maxBytes=0,
+        backupCount=0,
+        encoding=None,
+        capacity=512,
+        flush_interval=60,
+    ):
+        self.file_handler = RotatingFileHandler(
+            filename, maxBytes=maxBytes, backupCount=backupCount, encoding=encoding
+        )
+        self.buffer_handler = TimedMemoryHandler(
+            capacity,
+            flushLevel=logging.ERROR,
+            target=self.file_handler,
+            flush_interval=flush_interval,
+        )
+        super().__init__(queue.SimpleQueue())
+        self.listener = QueueListener(self.queue, self.buffer_handler)
+        self.listener.start()
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+            self.buffer_handler.close()
+            self.file_handler.close()
+        super().close()
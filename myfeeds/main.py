@@ -1,22 +1,52 @@
 import asyncio
 import logging
-from datetime import datetime
+import signal
+import sys
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
 from typing import Dict, Union
 
 import httpx
-from bs4 import BeautifulSoup
+import orjson
+from selectolax.parser import HTMLParser
 
 from myfeeds import env
 from myfeeds.config import config
-import contextvars
 
-youku_marker = contextvars.ContextVar("youku marker")
-weibo_marker = contextvars.ContextVar("weibo marker")
-bilibili_marker = contextvars.ContextVar("bilibili marker")
+WEIBO_TEMPLATE = env.get_template("weibo_statuses.md")
+BILIBILI_TEMPLATE = env.get_template("bilibili_submissions.md")
+YOUKU_TEMPLATE = env.get_template("youku_videos.md")
 
-youku_marker.set(None)
-weibo_marker.set(None)
-bilibili_marker.set(None)
+MONTHS = {
+    "Jan": 1,
+    "Feb": 2,
+    "Mar": 3,
+    "Apr": 4,
+    "May": 5,
+    "Jun": 6,
+    "Jul": 7,
+    "Aug": 8,
+    "Sep": 9,
+    "Oct": 10,
+    "Nov": 11,
+    "Dec": 12,
+}
+
+
+def parse_weibo_datetime(value):
+    # 微博时间格式固定, 例如 "Sat Oct 01 12:34:56 +0800 2022"
+    _, month, day, hms, tz, year = value.split()
+    hour, minute, second = hms.split(":")
+    offset = timedelta(hours=int(tz[:3]), minutes=int(tz[0] + tz[3:]))
+    return datetime(
+        int(year),
+        MONTHS[month],
+        int(day),
+        int(hour),
+        int(minute),
+        int(second),
+        tzinfo=timezone(offset),
+    )
 
 
 class Feeder:
@@ -26,10 +56,23 @@ class Feeder:
         "bilibili": "https://api.bilibili.com/x/space/arc/search",
         "youku": "http://i.youku.com/u/",
     }
+    max_concurrent_requests = 8
+    max_push_batch = 10
+    push_batch_wait = 5
 
     def __init__(self, sources=None):
         self.sources = sources or self.default_sources
         self.logger = logging.getLogger("feeder")
+        self._client = None
+        self._sem = None
+        self._push_queue = None
+        self._log_body = config.debug
+        self._markers = {}
+        self._task_map = {
+            "weibo": self.weibo_task,
+            "bilibili": self.bilibili_task,
+            "youku": self.youku_task,
+        }
 
     # 微博
     async def fetch_weibo_statuses(self, uid):
@@ -42,7 +85,7 @@ class Feeder:
             self.logger.exception(e, exc_info=True)
 
     def parse_weibo_status(self, status):
-        created_at = datetime.strptime(status["created_at"], "%a %b %d %H:%M:%S %z %Y")
+        created_at = parse_weibo_datetime(status["created_at"])
         timestamp = created_at.timestamp()
         parsed = {
             "source": "weibo",
@@ -59,18 +102,19 @@ class Feeder:
             parsed["retweeted"] = self.parse_weibo_status(retweeted)
         return parsed
 
-    def prepare_weibo_feed(self, statuses):
+    def prepare_weibo_feed(self, statuses, uid):
         if len(statuses) == 0:
             return ""
 
-        statuses = sorted(statuses, key=lambda s: s["timestamp"], reverse=True)
-        marker = weibo_marker.get()
+        statuses = sorted(statuses, key=lambda s: -s["timestamp"])
+        marker = self._markers.get(("weibo", uid))
         if marker is None:
             statuses = statuses[:1]
         else:
-            statuses = [s for s in statuses if s["timestamp"] > marker]
-        weibo_marker.set(datetime.now().timestamp())
-        return env.get_template("weibo_statuses.md").render(statuses=statuses)
+            index = bisect_left([-s["timestamp"] for s in statuses], -marker)
+            statuses = statuses[:index]
+        self._markers[("weibo", uid)] = datetime.now().timestamp()
+        return WEIBO_TEMPLATE.render(statuses=statuses)
 
     async def weibo_task(self, uid):
         while True:
@@ -79,7 +123,7 @@ class Feeder:
                 parsed_statuses = []
                 for status in statuses:
                     parsed_statuses.append(self.parse_weibo_status(status))
-                feed = self.prepare_weibo_feed(parsed_statuses)
+                feed = self.prepare_weibo_feed(parsed_statuses, uid)
                 await self.push(feed, "微博")
             await self.reportable_sleep(10 * 60, name="微博 Feeder")
 
@@ -103,20 +147,19 @@ class Feeder:
             "link": "https://www.bilibili.com/video/av" + str(submission["aid"]),
         }
 
-    def prepare_bilibili_feed(self, submissions):
+    def prepare_bilibili_feed(self, submissions, uid):
         if len(submissions) == 0:
             return ""
 
-        submissions = sorted(submissions, key=lambda s: s["timestamp"], reverse=True)
-        marker = bilibili_marker.get()
+        submissions = sorted(submissions, key=lambda s: -s["timestamp"])
+        marker = self._markers.get(("bilibili", uid))
         if marker is None:
             submissions = submissions[:1]
         else:
-            submissions = [s for s in submissions if s["timestamp"] > marker]
-        bilibili_marker.set(datetime.now().timestamp())
-        return env.get_template("bilibili_submissions.md").render(
-            submissions=submissions
-        )
+            index = bisect_left([-s["timestamp"] for s in submissions], -marker)
+            submissions = submissions[:index]
+        self._markers[("bilibili", uid)] = datetime.now().timestamp()
+        return BILIBILI_TEMPLATE.render(submissions=submissions)
 
     async def bilibili_task(self, uid):
         while True:
@@ -126,7 +169,7 @@ class Feeder:
                 parsed_submissions.append(
                     self.parse_bilibili_upunuxi_submission(submission)
                 )
-            feed = self.prepare_bilibili_feed(parsed_submissions)
+            feed = self.prepare_bilibili_feed(parsed_submissions, uid)
             await self.push(feed, "Bilibili")
             await self.reportable_sleep(10 * 60, name="Bilibili Feeder")
 
@@ -135,19 +178,19 @@ class Feeder:
         url = self.source_url["youku"] + str(uid)
         try:
             response = await self.request(url)
-            soup = BeautifulSoup(response, "html.parser")
-            videos = soup.find_all("div", class_="v va")
+            tree = HTMLParser(response)
+            videos = tree.css("div.v.va")
             return videos[:5]
         except Exception as e:
             self.logger.exception(e, exc_info=True)
 
     def parse_youku_video(self, video):
-        v_meta_link = video.find("div", class_="v-link")
-        a = v_meta_link.a
-        title = a["title"]
-        link = a["href"]
-        length = v_meta_link.find("span", class_="v-time").text
-        pub_time_des = video.find("span", class_="v-publishtime").text
+        v_meta_link = video.css_first("div.v-link")
+        a = v_meta_link.css_first("a")
+        title = a.attributes["title"]
+        link = a.attributes["href"]
+        length = v_meta_link.css_first("span.v-time").text()
+        pub_time_des = video.css_first("span.v-publishtime").text()
         return {
             "title": title,
             "link": link,
@@ -155,11 +198,11 @@ class Feeder:
             "length": length,
         }
 
-    def prepare_youku_feed(self, videos):
+    def prepare_youku_feed(self, videos, uid):
         if len(videos) == 0:
             return ""
 
-        marker = youku_marker.get()
+        marker = self._markers.get(("youku", uid))
         if marker is None:
             videos = videos[:1]
         else:
@@ -170,8 +213,8 @@ class Feeder:
                     break
                 videos.append(v)
         if videos:
-            youku_marker.set(videos[0]["title"])
-        return env.get_template("youku_videos.md").render(videos=videos)
+            self._markers[("youku", uid)] = videos[0]["title"]
+        return YOUKU_TEMPLATE.render(videos=videos)
 
     async def youku_task(self, uid):
         while True:
@@ -179,28 +222,64 @@ class Feeder:
             parsed_videos = []
             for video in videos:
                 parsed_videos.append(self.parse_youku_video(video))
-            feed = self.prepare_youku_feed(parsed_videos)
+            feed = self.prepare_youku_feed(parsed_videos, uid)
             await self.push(feed, "优酷")
             await self.reportable_sleep(10 * 60, name="优酷 Feeder")
 
+    # 推送
     async def push(self, feed, source):
         if not feed:
             return
 
-        text = f"[{source}]"
+        await self._push_queue.put((source, feed))
+
+    async def pusher(self):
+        while True:
+            feeds = [await self._push_queue.get()]
+            await asyncio.sleep(self.push_batch_wait)
+            while len(feeds) < self.max_push_batch:
+                try:
+                    feeds.append(self._push_queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            await self.send(feeds)
+
+    async def send(self, feeds):
+        if len(feeds) == 1:
+            source, desp = feeds[0]
+            text = f"[{source}]"
+        else:
+            text = "[汇总]"
+            desp = "\n\n---\n\n".join(
+                f"**[{source}]**\n{feed}" for source, feed in feeds
+            )
         url = f"https://sc.ftqq.com/{config.send_key}.send"
-        await self.request(url, "POST", data={"text": text, "desp": feed})
-        self.logger.info("Push a %s feed: %s", source, feed)
+        await self.request(url, "POST", data={"text": text, "desp": desp})
+        for source, feed in feeds:
+            self.logger.info("Push a %s feed: %s", source, feed)
 
     # 启动
     async def start(self):
-        tasks = []
-        for source in self.sources:
-            for id_ in config.sources.get(source):
-                tasks.append(getattr(self, f"{source}_task")(id_))
-        await asyncio.gather(*tasks)
+        tasks = [
+            self._task_map[source](id_)
+            for source in self.sources
+            for id_ in config.sources.get(source)
+        ]
+        tasks.append(self.pusher())
+        self._sem = asyncio.Semaphore(self.max_concurrent_requests)
+        self._push_queue = asyncio.Queue()
+        limits = httpx.Limits(max_keepalive_connections=20)
+        async with httpx.AsyncClient(
+            http2=True, limits=limits, timeout=None
+        ) as self._client:
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                self._client = None
 
     def run(self):
+        # docker stop / systemd 通过 SIGTERM 停止进程, 转为正常退出以便刷新缓冲的日志
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
         asyncio.run(self.start())
 
     # 辅助方法
@@ -216,36 +295,48 @@ class Feeder:
             data,
             json,
         )
-        async with httpx.AsyncClient() as client:
-            res = await client.request(
+        async with self._sem:
+            res = await self._client.request(
+                method, url, headers=headers, params=params, data=data, json=json,
+            )
+        is_json = "json" in res.headers.get("content-type", "")
+        # 正常的 JSON 响应在非调试模式下不记录响应体, 避免每次请求都解码一遍
+        if self._log_body or res.is_error or not is_json:
+            self.logger.debug(
+                "%s %s, response: status_code=%s headers=%s res_text=%s",
                 method,
                 url,
-                headers=headers,
-                params=params,
-                data=data,
-                json=json,
-                timeout=None,
+                res.status_code,
+                headers,
+                res.text,
+            )
+        else:
+            self.logger.debug(
+                "%s %s, response: status_code=%s headers=%s",
+                method,
+                url,
+                res.status_code,
+                headers,
             )
-        self.logger.debug(
-            "%s %s, response: status_code=%s headers=%s res_text=%s",
-            method,
-            url,
-            res.status_code,
-            headers,
-            res.text,
-        )
 
         res.raise_for_status()
-        res_text = res.text
-        if res_text.startswith("{") or res_text.startswith("["):
-            return res.json()
-        return res_text
+        if is_json:
+            return orjson.loads(res.content)
+        return res.text
 
     async def reportable_sleep(self, seconds, name=""):
-        for i in range(seconds):
-            if i % 60 == 0:
-                self.logger.info("%s 正在待机, 将在%s分钟后重新启动...", name, (seconds - i) // 60)
-            await asyncio.sleep(1)
+        async def report():
+            remaining = seconds
+            while remaining > 0:
+                self.logger.info("%s 正在待机, 将在%s分钟后重新启动...", name, remaining // 60)
+                await asyncio.sleep(60)
+                remaining -= 60
+
+        reporter = asyncio.create_task(report())
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            reporter.cancel()
 
 
 if __name__ == "__main__":